@@ -0,0 +1,203 @@
+# app/compaction.py
+#
+# Tiered retention for the raw vitals collection.
+#
+# Readings older than VITALS_ARCHIVE_AFTER_DAYS are rewritten into one
+# compressed document per user per day in `vitals_archive`, then the raw rows
+# are bulk-deleted. The job always starts from the oldest raw reading left
+# before the cutoff, and archive merges dedupe by reading _id, so a pass that
+# is interrupted between archiving and deleting is simply finished by the
+# next one.
+
+import asyncio
+import os
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import bson
+from bson import Binary
+
+from .database import db
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("VITALS_ARCHIVE_AFTER_DAYS", 30))
+# Compaction works in slices of COMPACTION_SLICE_SECONDS and then sleeps so that
+# it uses at most COMPACTION_DUTY_CYCLE of wall time, leaving the rest to live traffic.
+COMPACTION_SLICE_SECONDS = float(os.getenv("VITALS_COMPACTION_SLICE_MS", 500)) / 1000
+COMPACTION_DUTY_CYCLE = float(os.getenv("VITALS_COMPACTION_DUTY_CYCLE", 0.5))
+
+
+def _day_start(ts: datetime) -> datetime:
+    return datetime(ts.year, ts.month, ts.day)
+
+
+def archive_cutoff() -> datetime:
+    """Readings before this instant belong to the archive tier."""
+    return _day_start(datetime.utcnow() - timedelta(days=ARCHIVE_AFTER_DAYS))
+
+
+def _pack(readings: List[Dict[str, Any]]) -> Binary:
+    return Binary(zlib.compress(bson.encode({"r": readings}), 6))
+
+
+def _unpack(data: bytes) -> List[Dict[str, Any]]:
+    return bson.decode(zlib.decompress(data))["r"]
+
+
+async def ensure_archive_indexes():
+    await db.vitals.create_index([("timestamp", 1)])
+    # Per-user range scans: compaction's user-day fetch, history reads and exports
+    await db.vitals.create_index([("user_id", 1), ("timestamp", 1), ("_id", 1)])
+    await db.vitals_archive.create_index([("user_id", 1), ("day", -1)], unique=True)
+
+
+async def _archive_user_day(user_id: str, day: datetime, raw: List[Dict[str, Any]]) -> int:
+    """Merges raw readings into the user's archive document for `day`. Returns bytes freed."""
+    existing = await db.vitals_archive.find_one({"user_id": user_id, "day": day})
+    readings = _unpack(existing["data"]) if existing else []
+    old_size = len(existing["data"]) if existing else 0
+
+    seen = {r["_id"] for r in readings}
+    raw_bytes = 0
+    for doc in raw:
+        raw_bytes += len(bson.encode(doc))
+        if doc["_id"] in seen:
+            continue
+        reading = {k: v for k, v in doc.items() if k != "user_id"}
+        readings.append(reading)
+    readings.sort(key=lambda r: r["timestamp"])
+
+    data = _pack(readings)
+    await db.vitals_archive.update_one(
+        {"user_id": user_id, "day": day},
+        {"$set": {
+            "count": len(readings),
+            "first_ts": readings[0]["timestamp"],
+            "last_ts": readings[-1]["timestamp"],
+            "data": data,
+            "updated_at": datetime.utcnow()
+        }},
+        upsert=True
+    )
+    await db.vitals.delete_many({"_id": {"$in": [doc["_id"] for doc in raw]}})
+    return raw_bytes - (len(data) - old_size)
+
+
+class _Throttle:
+    """Sleeps between work slices to keep compaction at COMPACTION_DUTY_CYCLE."""
+
+    def __init__(self):
+        self._slice_start = time.monotonic()
+
+    async def tick(self):
+        worked = time.monotonic() - self._slice_start
+        if worked >= COMPACTION_SLICE_SECONDS:
+            await asyncio.sleep(worked * (1 - COMPACTION_DUTY_CYCLE) / COMPACTION_DUTY_CYCLE)
+            self._slice_start = time.monotonic()
+
+
+async def compact_vitals() -> Dict[str, Any]:
+    """Runs one throttled compaction pass over everything older than the cutoff."""
+    cutoff = archive_cutoff()
+    stats = {"user_days": 0, "readings": 0, "bytes_reclaimed": 0}
+    throttle = _Throttle()
+
+    # Each pass moves forward a day at a time, so rows it leaves behind
+    # (e.g. ones without a user_id) cannot make it revisit the same day.
+    next_day: Optional[datetime] = None
+    while True:
+        pending = {"$lt": cutoff}
+        if next_day:
+            pending["$gte"] = next_day
+        oldest = await db.vitals.find_one(
+            {"timestamp": pending},
+            sort=[("timestamp", 1)],
+            projection={"timestamp": 1}
+        )
+        if not oldest:
+            break
+
+        day = _day_start(oldest["timestamp"])
+        next_day = day + timedelta(days=1)
+        day_range = {"$gte": day, "$lt": min(next_day, cutoff)}
+        user_ids = [u for u in await db.vitals.distinct("user_id", {"timestamp": day_range}) if u]
+
+        day_bytes = 0
+        for user_id in user_ids:
+            raw = await db.vitals.find({"user_id": user_id, "timestamp": day_range}).to_list(length=None)
+            if raw:
+                day_bytes += await _archive_user_day(user_id, day, raw)
+                stats["readings"] += len(raw)
+            stats["user_days"] += 1
+            await throttle.tick()
+
+        await throttle.tick()
+        stats["bytes_reclaimed"] += day_bytes
+        await db.compaction_state.update_one(
+            {"_id": "vitals"},
+            {
+                "$set": {"last_day": day, "updated_at": datetime.utcnow()},
+                "$inc": {"bytes_reclaimed": day_bytes}
+            },
+            upsert=True
+        )
+
+    print(
+        f"✅ Compacted {stats['readings']} vitals across {stats['user_days']} user-days, "
+        f"reclaimed ~{stats['bytes_reclaimed']} bytes."
+    )
+    return stats
+
+
+async def read_archived_vitals(
+    user_id: str,
+    since: Optional[datetime],
+    limit: int,
+    exclude_ids: Iterable[Any] = ()
+) -> List[Dict[str, Any]]:
+    """Returns up to `limit` archived readings for a user, newest first."""
+    filter: Dict[str, Any] = {"user_id": user_id}
+    if since:
+        filter["last_ts"] = {"$gte": since}
+
+    exclude = set(exclude_ids)
+    results: List[Dict[str, Any]] = []
+    async for archive in db.vitals_archive.find(filter).sort("day", -1):
+        for reading in reversed(_unpack(archive["data"])):
+            if since and reading["timestamp"] < since:
+                break
+            if reading["_id"] in exclude:
+                continue
+            reading["user_id"] = user_id
+            results.append(reading)
+            if len(results) >= limit:
+                return results
+    return results
+
+
+async def iter_archived_readings(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yields a user's archived readings oldest first, one day document at a time."""
+    filter: Dict[str, Any] = {"user_id": user_id}
+    if start:
+        filter["last_ts"] = {"$gte": start}
+    if end:
+        filter["day"] = {"$lt": end}
+
+    async for archive in db.vitals_archive.find(filter).sort("day", 1):
+        readings = sorted(_unpack(archive["data"]), key=lambda r: (r["timestamp"], r["_id"]))
+        for reading in readings:
+            if (start and reading["timestamp"] < start) or (end and reading["timestamp"] >= end):
+                continue
+            reading["user_id"] = user_id
+            yield reading
+
+
+async def archived_ids(user_id: str, day: datetime) -> set:
+    """Ids archived for one user-day; used to skip raw rows whose delete is still pending."""
+    archive = await db.vitals_archive.find_one({"user_id": user_id, "day": _day_start(day)})
+    return {r["_id"] for r in _unpack(archive["data"])} if archive else set()
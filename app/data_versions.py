@@ -0,0 +1,88 @@
+# app/data_versions.py
+#
+# Per-user data version counters used for conditional GETs on the history
+# endpoints.
+#
+# Each write to a user's vitals or appointments bumps a counter in the small
+# `data_versions` collection ({_id: user_id, vitals: n, appointments: n}).
+# History responses carry an ETag built from that counter and the query
+# parameters, so an If-None-Match poll is answered with 304 after a single
+# point lookup here, without touching vitals or appointments.
+#
+# Counters are cached in a bounded LRU. Writes made by this process update the
+# cache immediately; entries are re-read after DATA_VERSION_CACHE_SECONDS so
+# writes from other workers are picked up.
+
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+from .database import db
+
+DATA_VERSION_CACHE_SECONDS = float(os.getenv("DATA_VERSION_CACHE_SECONDS", 2))
+DATA_VERSION_CACHE_SIZE = int(os.getenv("DATA_VERSION_CACHE_SIZE", 10000))
+# Windows relative to "now" (?days=, ?upcoming=) shift without any write, so
+# their ETags also roll over every ETAG_TIME_BUCKET_SECONDS.
+ETAG_TIME_BUCKET_SECONDS = int(os.getenv("ETAG_TIME_BUCKET_SECONDS", 60))
+
+_cache: "OrderedDict[str, Tuple[dict, float]]" = OrderedDict()
+
+
+def _remember(user_id: str, doc: dict):
+    _cache[user_id] = (doc, time.monotonic())
+    _cache.move_to_end(user_id)
+    while len(_cache) > DATA_VERSION_CACHE_SIZE:
+        _cache.popitem(last=False)
+
+
+async def get_version(user_id: str, kind: str) -> int:
+    cached = _cache.get(user_id)
+    if cached and time.monotonic() - cached[1] < DATA_VERSION_CACHE_SECONDS:
+        _cache.move_to_end(user_id)
+        return cached[0].get(kind, 0)
+
+    doc = await db.data_versions.find_one({"_id": user_id}) or {}
+    _remember(user_id, doc)
+    return doc.get(kind, 0)
+
+
+async def bump_version(user_id: str, kind: str) -> int:
+    doc = await db.data_versions.find_one_and_update(
+        {"_id": user_id},
+        {"$inc": {kind: 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    _remember(user_id, doc)
+    return doc[kind]
+
+
+def make_etag(
+    user_id: str, kind: str, version: int, params: Dict[str, object], time_relative: bool = False
+) -> str:
+    # The user id is part of the digest: counters start at the same value for
+    # everyone, and a shared device cache keys only on the URL.
+    key = f"user={user_id}&" + "&".join(f"{k}={params[k]}" for k in sorted(params) if params[k] is not None)
+    if time_relative:
+        key += f"&bucket={int(time.time()) // ETAG_TIME_BUCKET_SECONDS}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f'"{kind}-{version}-{digest}"'
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    """Headers for both the 200 and the 304 of a per-user history response."""
+    return {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
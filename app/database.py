@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 import os
 
 from app.models import User, Vitals, Appointment, Doctor  # ✅ Import your Beanie models
+from app.profiling import MotorTimer
 
 # Load environment variables
 load_dotenv()
@@ -15,7 +16,7 @@ if not MONGO_URI:
     raise ValueError("⚠️ MONGO_URI is not set in the .env file!")
 
 # Create Motor client
-client = AsyncIOMotorClient(MONGO_URI)
+client = AsyncIOMotorClient(MONGO_URI, event_listeners=[MotorTimer()])  # feeds profile motor_seconds
 db = client["carepulse"]  # You can rename this if needed
 
 # ✅ Beanie Initialization function
@@ -0,0 +1,103 @@
+# app/doctor_directory.py
+#
+# Process-wide in-memory doctor directory.
+#
+# The roster is small and rarely changes, so it is loaded once at startup and
+# kept current from a MongoDB change stream. Deployments without a replica set
+# (where change streams are unavailable) fall back to reloading every
+# DOCTOR_DIRECTORY_TTL seconds. Readers take an immutable snapshot, so one
+# booking or one scheduler pass always sees a consistent roster.
+
+import asyncio
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from .database import db
+
+DOCTOR_DIRECTORY_TTL = int(os.getenv("DOCTOR_DIRECTORY_TTL", 60))
+
+
+class DoctorSnapshot:
+    """Immutable view of the roster, indexed by specialization and availability."""
+
+    def __init__(self, doctors: Dict[Any, Dict[str, Any]], version: int = 0):
+        self.doctors = doctors
+        self.version = version
+
+        available: Dict[str, list] = {}
+        for doctor in sorted(doctors.values(), key=lambda d: d["_id"]):
+            if doctor.get("is_available"):
+                available.setdefault(doctor.get("specialization"), []).append(doctor)
+        self.available_by_specialization: Dict[str, Tuple[Dict[str, Any], ...]] = {
+            specialization: tuple(docs) for specialization, docs in available.items()
+        }
+
+    def first_available(self, specialization: str) -> Optional[Dict[str, Any]]:
+        doctors = self.available_by_specialization.get(specialization)
+        return doctors[0] if doctors else None
+
+
+class DoctorDirectory:
+    def __init__(self):
+        self._snapshot = DoctorSnapshot({})
+        self._version = 0
+
+    def snapshot(self) -> DoctorSnapshot:
+        return self._snapshot
+
+    def _publish(self, doctors: Dict[Any, Dict[str, Any]]):
+        self._version += 1
+        self._snapshot = DoctorSnapshot(doctors, self._version)
+
+    async def load(self):
+        docs = await db.doctors.find({}).to_list(length=None)
+        self._publish({doc["_id"]: doc for doc in docs})
+
+    def _apply_change(self, change: Dict[str, Any]) -> bool:
+        """Applies one change stream event. Returns False if a full reload is needed."""
+        operation = change.get("operationType")
+        doctors = dict(self._snapshot.doctors)
+
+        if operation in ("insert", "update", "replace"):
+            doc = change.get("fullDocument")
+            if doc is None:  # deleted before the update lookup ran
+                doctors.pop(change["documentKey"]["_id"], None)
+            else:
+                doctors[doc["_id"]] = doc
+        elif operation == "delete":
+            doctors.pop(change["documentKey"]["_id"], None)
+        else:  # drop, rename, invalidate
+            return False
+
+        self._publish(doctors)
+        return True
+
+    async def _watch(self):
+        async with db.doctors.watch(full_document="updateLookup") as stream:
+            await self.load()  # pick up anything that changed before the stream opened
+            async for change in stream:
+                if not self._apply_change(change):
+                    await self.load()
+
+    async def refresh_loop(self):
+        """Follows the change stream; falls back to TTL polling when it is unavailable."""
+        polling = False
+        while True:
+            try:
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not polling:
+                    print(f"⚠️ Doctor change stream unavailable, polling every {DOCTOR_DIRECTORY_TTL}s: {e}")
+                    polling = True
+
+            await asyncio.sleep(DOCTOR_DIRECTORY_TTL)
+            try:
+                await self.load()
+            except Exception as e:
+                print(f"❌ Error reloading doctor directory: {e}")
+
+
+# Singleton instance to use across the app
+doctor_directory = DoctorDirectory()
@@ -0,0 +1,388 @@
+# app/export.py
+#
+# Streaming bulk export of vitals and appointments as CSV or Parquet.
+#
+# Documents flow Motor cursor -> row generator -> chunk encoder, so memory
+# stays bounded by one cursor batch plus one chunk / row group no matter how
+# large the range is.
+#
+# Vitals include the compacted archive tier (app/compaction.py): each user's
+# archived readings are streamed first, then the raw ones, which are newer.
+#
+# Rows are ordered by (user_id, date field, _id), which the indexes in
+# ensure_export_indexes serve directly. The resume token of a row is
+# "<user_id>|<date field ISO>|<_id>", built from its own columns; pass the
+# token of the last row you have as `after` to continue from there.
+#
+# CLI:
+#   python -m app.export vitals --format parquet --out vitals.parquet \
+#       --user <user_id> --start 2025-01-01 --end 2025-02-01 [--after <token> | --resume]
+#
+# The CLI keeps the last written token in <out>.resume, at the end and when
+# interrupted. Resumed CSV exports append to <out>; resumed Parquet exports
+# go to a new part file next to it, since a Parquet file cannot be appended to.
+
+import argparse
+import asyncio
+import csv
+import io
+import os
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional; CSV export works without it
+    pa = None
+    pq = None
+
+CURSOR_BATCH_SIZE = 5000
+CSV_ROWS_PER_CHUNK = 5000
+PARQUET_ROW_GROUP_SIZE = 100_000
+
+# Column order and type per collection: "str", "int", "float" or "datetime"
+EXPORT_COLUMNS = {
+    "vitals": {
+        "_id": "str",
+        "user_id": "str",
+        "timestamp": "datetime",
+        "heart_rate": "int",
+        "bp_systolic": "int",
+        "bp_diastolic": "int",
+        "oxygen": "int",
+        "temperature": "float",
+        "sugar": "int",
+        "symptoms": "str",
+    },
+    "appointments": {
+        "_id": "str",
+        "user_id": "str",
+        "reason": "str",
+        "notes": "str",
+        "doctor_name": "str",
+        "status": "str",
+        "preferred_date": "str",  # datetime from the API, ISO string from the scheduler
+        "preferred_time": "str",
+        "created_at": "datetime",
+        "updated_at": "datetime",
+    },
+}
+
+# Field the start/end range applies to; also the per-user sort key
+DATE_FIELDS = {"vitals": "timestamp", "appointments": "created_at"}
+
+# Backs the (user_id, date field, _id) scan of every export
+EXPORT_INDEXES = {
+    "vitals": [("user_id", 1), ("timestamp", 1), ("_id", 1)],
+    "appointments": [("user_id", 1), ("created_at", 1), ("_id", 1)],
+}
+
+
+async def ensure_export_indexes(db):
+    for collection, keys in EXPORT_INDEXES.items():
+        await db[collection].create_index(keys)
+
+
+class ExportProgress:
+    """Resume token of the last row in the most recently emitted chunk."""
+
+    def __init__(self, after: Optional[str] = None):
+        self.token = after
+        self.trailer = b""  # Parquet footer written after an interruption
+
+
+def make_resume_token(collection: str, row: Dict[str, Any]) -> str:
+    value = row.get(DATE_FIELDS[collection]) or datetime.min
+    return f"{row['user_id']}|{value.isoformat()}|{row['_id']}"
+
+
+def parse_resume_token(token: str) -> Tuple[str, datetime, ObjectId]:
+    """Raises ValueError for malformed tokens."""
+    user_id, value, object_id = token.split("|")
+    if not ObjectId.is_valid(object_id):
+        raise ValueError("Invalid _id in resume token")
+    return user_id, datetime.fromisoformat(value), ObjectId(object_id)
+
+
+def to_naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Stored timestamps are naive UTC; aware bounds are converted so they compare."""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _normalize(doc: Dict[str, Any], columns: Dict[str, str]) -> Dict[str, Any]:
+    row = {}
+    for name, kind in columns.items():
+        value = doc.get(name)
+        if value is not None and kind == "str" and not isinstance(value, str):
+            value = value.isoformat() if isinstance(value, datetime) else str(value)
+        elif kind == "datetime" and not isinstance(value, datetime):
+            value = None
+        row[name] = value
+    return row
+
+
+async def iter_rows(
+    db,
+    collection: str,
+    user_ids: Optional[List[str]] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    after: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Yields documents normalized to the export columns, user by user."""
+    columns = EXPORT_COLUMNS[collection]
+    order_field = DATE_FIELDS[collection]
+    resume_user, resume_value, resume_id = parse_resume_token(after) if after else (None, None, None)
+
+    archived = collection == "vitals"
+    if archived:
+        # Imported here so the encoders stay usable without a database configured
+        from .compaction import archive_cutoff, archived_ids, iter_archived_readings
+
+    if not user_ids:
+        user_ids = await db[collection].distinct("user_id")
+        if archived:
+            user_ids += await db.vitals_archive.distinct("user_id")
+
+    for user_id in sorted(set(user_ids)):
+        if resume_user is not None and user_id < resume_user:
+            continue
+        resuming = user_id == resume_user
+
+        if archived:
+            archive_start = start
+            if resuming and (start is None or resume_value > start):
+                archive_start = resume_value
+            async for reading in iter_archived_readings(user_id, archive_start, end):
+                if resuming and (reading["timestamp"], reading["_id"]) <= (resume_value, resume_id):
+                    continue
+                yield _normalize(reading, columns)
+
+        filter: Dict[str, Any] = {"user_id": user_id}
+        date_range = {}
+        if start:
+            date_range["$gte"] = start
+        if end:
+            date_range["$lt"] = end
+        if date_range:
+            filter[order_field] = date_range
+        if resuming:
+            filter["$or"] = [
+                {order_field: {"$gt": resume_value}},
+                {order_field: resume_value, "_id": {"$gt": resume_id}},
+            ]
+
+        cursor = (
+            db[collection].find(filter, projection=list(columns))
+            .sort([(order_field, 1), ("_id", 1)])
+            .batch_size(CURSOR_BATCH_SIZE)
+        )
+        cutoff = archive_cutoff() if archived else None
+        pending_days: Dict[datetime, set] = {}
+        async for doc in cursor:
+            value = doc.get(order_field)
+            if cutoff and value and value < cutoff:
+                # Older than the cutoff: may already be archived and awaiting its delete
+                day = datetime(value.year, value.month, value.day)
+                if day not in pending_days:
+                    pending_days[day] = await archived_ids(user_id, day)
+                if doc["_id"] in pending_days[day]:
+                    continue
+            yield _normalize(doc, columns)
+
+
+async def csv_chunks(
+    rows: AsyncIterator[Dict[str, Any]],
+    collection: str,
+    progress: ExportProgress,
+    header: bool = True,
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=list(EXPORT_COLUMNS[collection]))
+    if header:
+        writer.writeheader()
+
+    pending = 0
+    last_token = progress.token
+    async for row in rows:
+        writer.writerow({k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in row.items()})
+        last_token = make_resume_token(collection, row)
+        pending += 1
+        if pending >= CSV_ROWS_PER_CHUNK:
+            progress.token = last_token
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    progress.token = last_token
+    yield buffer.getvalue().encode()
+
+
+class _StreamSink:
+    """Write-only file object that hands out what Parquet has written so far."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._buffer += data
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        return data
+
+
+def _arrow_schema(collection: str):
+    types = {
+        "str": pa.string(),
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "datetime": pa.timestamp("ms"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in EXPORT_COLUMNS[collection].items()])
+
+
+async def parquet_chunks(
+    rows: AsyncIterator[Dict[str, Any]],
+    collection: str,
+    progress: ExportProgress,
+) -> AsyncIterator[bytes]:
+    if pa is None:
+        raise RuntimeError("Parquet export requires pyarrow")
+
+    schema = _arrow_schema(collection)
+    names = schema.names
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+
+    def flush_group(columns: Dict[str, list], last_token: str):
+        writer.write_table(pa.table(columns, schema=schema))
+        progress.token = last_token
+        return sink.drain()
+
+    try:
+        columns = {name: [] for name in names}
+        pending = 0
+        last_token = progress.token
+        async for row in rows:
+            for name in names:
+                columns[name].append(row[name])
+            last_token = make_resume_token(collection, row)
+            pending += 1
+            if pending >= PARQUET_ROW_GROUP_SIZE:
+                yield flush_group(columns, last_token)
+                columns = {name: [] for name in names}
+                pending = 0
+
+        if pending:
+            yield flush_group(columns, last_token)
+        writer.close()
+        yield sink.drain()
+    finally:
+        # Interrupted: close the row groups already emitted into a readable file
+        if writer.is_open:
+            writer.close()
+            progress.trailer = sink.drain()
+
+
+def export_stream(
+    db,
+    collection: str,
+    format: str,
+    progress: ExportProgress,
+    header: bool = True,
+    **query,
+) -> AsyncIterator[bytes]:
+    rows = iter_rows(db, collection, after=progress.token, **query)
+    if format == "parquet":
+        return parquet_chunks(rows, collection, progress)
+    return csv_chunks(rows, collection, progress, header=header)
+
+
+# ==== CLI ====
+def _next_part_path(path: str) -> str:
+    stem, extension = os.path.splitext(path)
+    part = 1
+    while os.path.exists(f"{stem}.part{part}{extension}"):
+        part += 1
+    return f"{stem}.part{part}{extension}"
+
+
+async def _run_cli(args):
+    from .database import client, db
+
+    resume_path = f"{args.out}.resume"
+    after = args.after
+    if args.resume and not after and os.path.exists(resume_path):
+        with open(resume_path) as f:
+            after = f.read().strip() or None
+
+    out, mode = args.out, "wb"
+    if after:
+        if args.format == "csv":
+            mode = "ab"
+        else:
+            out = _next_part_path(args.out)
+
+    progress = ExportProgress(after)
+    stream = export_stream(
+        db, args.collection, args.format, progress,
+        header=mode == "wb",
+        user_ids=args.user, start=to_naive_utc(args.start), end=to_naive_utc(args.end),
+    )
+    completed = False
+    try:
+        with open(out, mode) as f:
+            try:
+                async for chunk in stream:
+                    f.write(chunk)
+                completed = True
+            finally:
+                await stream.aclose()
+                f.write(progress.trailer)
+    finally:
+        client.close()
+        if progress.token:
+            with open(resume_path, "w") as f:
+                f.write(progress.token + "\n")
+        if completed:
+            print(f"✅ Exported {args.collection} to {out} (last row: {progress.token})")
+        else:
+            print(f"⚠️ Export interrupted; resume with --resume or --after '{progress.token}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream vitals or appointments to CSV / Parquet.")
+    parser.add_argument("collection", choices=list(EXPORT_COLUMNS))
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--out", required=True)
+    parser.add_argument("--user", action="append", help="Filter by user id (repeatable)")
+    parser.add_argument("--start", type=datetime.fromisoformat, help="Inclusive start (ISO date/time, UTC)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Exclusive end (ISO date/time, UTC)")
+    parser.add_argument("--after", help="Resume after this row token (user_id|date|_id)")
+    parser.add_argument("--resume", action="store_true", help="Resume from the token in <out>.resume")
+    asyncio.run(_run_cli(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
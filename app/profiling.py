@@ -0,0 +1,203 @@
+# app/profiling.py
+#
+# On-demand profiling of single requests and background passes.
+#
+# A request is profiled when it carries `X-Profile: <PROFILE_ADMIN_TOKEN>`, or
+# when it is picked by PROFILE_SAMPLE_RATE. Profiles are recorded with
+# pyinstrument in async mode, so time spent across await boundaries shows up
+# as [await] frames. Time spent in MongoDB commands is summed separately by
+# a pymongo command listener (see MotorTimer), since Motor runs them on
+# executor threads the sampler never attributes to the awaiting coroutine.
+# The last PROFILE_BUFFER_SIZE profiles are kept in memory and can be
+# downloaded from /admin/profiles.
+#
+# With no admin token and no sample rate the middleware is not installed,
+# so there is no per-request cost at all.
+
+import os
+import random
+import secrets
+import time
+import uuid
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pymongo import monitoring
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+except ImportError:  # pyinstrument is optional; profiling stays off without it
+    Profiler = None
+
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", 50))
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 1)) / 1000
+
+profiles: deque = deque(maxlen=PROFILE_BUFFER_SIZE)
+_armed: set = set()  # background passes to profile once, e.g. "scheduler"
+# Command time of the profile being recorded, in microseconds. A one-element
+# list so the copies of the context Motor runs on its executor threads all
+# add to the same total.
+_command_micros: ContextVar[Optional[List[int]]] = ContextVar("profile_command_micros", default=None)
+
+
+def profiling_enabled() -> bool:
+    return Profiler is not None and (bool(PROFILE_ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0)
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    if not PROFILE_ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+
+def _sampled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+
+def _new_profiler():
+    return Profiler(interval=PROFILE_INTERVAL, async_mode="enabled")
+
+
+class MotorTimer(monitoring.CommandListener):
+    """Adds the duration of every MongoDB command to the current profile, if any."""
+
+    def started(self, event):
+        pass
+
+    def _add(self, event):
+        total = _command_micros.get()
+        if total is not None:
+            total[0] += event.duration_micros
+
+    succeeded = _add
+    failed = _add
+
+
+@contextmanager
+def _timing_commands():
+    total = [0]
+    token = _command_micros.set(total)
+    try:
+        yield total
+    finally:
+        _command_micros.reset(token)
+
+
+def _record(profile_id: str, name: str, started_at: datetime, duration: float, profiler, command_micros: int):
+    profiles.append({
+        "id": profile_id,
+        "name": name,
+        "started_at": started_at,
+        "duration": duration,
+        "motor_seconds": command_micros / 1_000_000,
+        "session": profiler.last_session,
+    })
+
+
+def arm(name: str):
+    """Profiles the next run of a background pass wrapped in profile_block(name)."""
+    _armed.add(name)
+
+
+@asynccontextmanager
+async def profile_block(name: str):
+    """Profiles the wrapped block when it was armed or picked by sampling."""
+    if Profiler is None or not (name in _armed or _sampled()):
+        yield
+        return
+
+    _armed.discard(name)
+    profiler = _new_profiler()
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    with _timing_commands() as command_micros:
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            _record(
+                uuid.uuid4().hex[:12], name, started_at, time.perf_counter() - start,
+                profiler, command_micros[0]
+            )
+
+
+class ProfilingMiddleware:
+    """Pure ASGI middleware, so the endpoint runs in the same task as the profiler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        forced = False
+        if PROFILE_ADMIN_TOKEN:
+            for key, value in scope["headers"]:
+                if key == b"x-profile":
+                    forced = is_admin_token(value.decode("latin-1"))
+                    break
+        if not (forced or _sampled()):
+            return await self.app(scope, receive, send)
+
+        profile_id = uuid.uuid4().hex[:12]
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-id", profile_id.encode())
+                ]
+            await send(message)
+
+        profiler = _new_profiler()
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        with _timing_commands() as command_micros:
+            profiler.start()
+            try:
+                await self.app(scope, receive, send_with_profile_id)
+            finally:
+                profiler.stop()
+                _record(
+                    profile_id,
+                    f"{scope['method']} {scope['path']}",
+                    started_at,
+                    time.perf_counter() - start,
+                    profiler,
+                    command_micros[0]
+                )
+
+
+def list_profiles() -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": p["id"],
+            "name": p["name"],
+            "started_at": p["started_at"].isoformat(),
+            "duration": round(p["duration"], 6),
+            "motor_seconds": round(p["motor_seconds"], 6),
+        }
+        for p in reversed(profiles)
+    ]
+
+
+def render_profile(profile_id: str, format: str = "html") -> Optional[str]:
+    """Renders a stored profile as html, text or speedscope JSON. None if it was evicted."""
+    entry = next((p for p in profiles if p["id"] == profile_id), None)
+    if entry is None or entry["session"] is None:
+        return None
+
+    if format == "text":
+        renderer = ConsoleRenderer(unicode=True, color=False)
+    elif format == "speedscope":
+        renderer = SpeedscopeRenderer()
+    else:
+        renderer = HTMLRenderer()
+    return renderer.render(entry["session"])
@@ -1,4 +1,5 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict
 from pydantic import BaseModel, Field
@@ -12,6 +13,14 @@ from bson import ObjectId
 from .database import db  # MongoDB database client
 from .auth import hash_password, verify_password, create_access_token, get_current_user
 from .specialization_mapping import get_specialist_for_symptom
+from .compaction import archive_cutoff, read_archived_vitals
+from . import profiling
+from .data_versions import bump_version, cache_headers, etag_matches, get_version, make_etag
+from .doctor_directory import doctor_directory
+from .export import (
+    DATE_FIELDS, EXPORT_COLUMNS, ExportProgress, export_stream, pa, parse_resume_token, to_naive_utc
+)
+from .ws_protocol import BinaryChannel, negotiate_encoding, serialize_default
 import openai
 
 # Load environment variables
@@ -82,13 +91,21 @@ class AppointmentOut(AppointmentCreate):
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
+        self.binary_channels: Dict[str, BinaryChannel] = {}  # only for msgpack clients
 
     async def connect(self, websocket: WebSocket, user_id: str):
-        await websocket.accept()
+        use_binary, subprotocol = negotiate_encoding(websocket)
+        await websocket.accept(subprotocol=subprotocol)
+        self.disconnect(user_id)
         self.active_connections[user_id] = websocket
+        if use_binary:
+            self.binary_channels[user_id] = BinaryChannel(websocket, on_error=lambda: self.disconnect(user_id))
 
     def disconnect(self, user_id: str):
         self.active_connections.pop(user_id, None)
+        channel = self.binary_channels.pop(user_id, None)
+        if channel:
+            channel.close()
 
     async def send_personal_message(self, message: str, user_id: str):
         ws = self.active_connections.get(user_id)
@@ -98,10 +115,25 @@ class ConnectionManager:
             except Exception:
                 self.disconnect(user_id)
 
+    async def send_event(self, event: str, data: dict, user_id: str):
+        channel = self.binary_channels.get(user_id)
+        if channel:
+            channel.enqueue(event, data)
+            return
+        await self.send_personal_message(
+            json.dumps({"event": event, "data": data}, default=serialize_default),
+            user_id
+        )
+
     async def broadcast(self, message: dict):
+        text = json.dumps(message, default=serialize_default)
         for uid, ws in list(self.active_connections.items()):
+            channel = self.binary_channels.get(uid)
+            if channel:
+                channel.enqueue(message.get("event"), message.get("data"))
+                continue
             try:
-                await ws.send_json(message)
+                await ws.send_text(text)
             except Exception:
                 self.disconnect(uid)
 
@@ -194,24 +226,30 @@ async def submit_vitals(data: VitalsCreate, current_user: dict = Depends(get_cur
     })
     result = await db.vitals.insert_one(vitals)
     vitals["_id"] = str(result.inserted_id)
+    await bump_version(vitals["user_id"], "vitals")
 
-    # 🛠️ FIX: make datetime serializable
-    vitals_copy = {**vitals, "timestamp": vitals["timestamp"].isoformat()}
-
-    await manager.send_personal_message(
-        json.dumps({"event": "new_vitals", "data": vitals_copy}),
-        current_user["_id"]
-    )
+    # JSON clients get the timestamp as ISO text; msgpack clients get a delta frame
+    await manager.send_event("new_vitals", vitals, str(current_user["_id"]))
 
     return vitals
 
 @router.get("/vitals", response_model=List[VitalsOut])
 async def get_vitals(
+    request: Request,
+    response: Response,
     days: Optional[int] = Query(None),
     limit: Optional[int] = Query(None),
     current_user: dict = Depends(get_current_user)
 ):
     filter = {"user_id": str(current_user["_id"])}
+    since = None
+
+    # ✅ Conditional GET: answer unchanged polls without querying vitals
+    version = await get_version(filter["user_id"], "vitals")
+    etag = make_etag(filter["user_id"], "vitals", version, {"days": days, "limit": limit}, time_relative=bool(days))
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=cache_headers(etag))
+    response.headers.update(cache_headers(etag))
     
     if days:
         since = datetime.utcnow() - timedelta(days=days)
@@ -222,6 +260,16 @@ async def get_vitals(
         cursor = cursor.limit(limit)
 
     results = await cursor.to_list(length=limit or 1000)
+
+    # Fill up from the archive tier when the window reaches past the compaction cutoff
+    wanted = limit or 1000
+    if len(results) < wanted and (since is None or since < archive_cutoff()):
+        archived = await read_archived_vitals(
+            filter["user_id"], since, wanted - len(results),
+            exclude_ids=[doc["_id"] for doc in results]
+        )
+        results = sorted(results + archived, key=lambda doc: doc["timestamp"], reverse=True)[:wanted]
+
     for doc in results:
         doc["_id"] = str(doc["_id"])
         doc["timestamp"] = doc["timestamp"].isoformat()  # 🛠️ fix datetime
@@ -237,7 +285,7 @@ async def analyze_symptoms(payload: SymptomInput, current_user: dict = Depends(g
 async def book_appointment(payload: AppointmentCreate, current_user: dict = Depends(get_current_user)):
     try:
         specialization = get_specialist_for_symptom(payload.reason)
-        doctor = await db.doctors.find_one({"specialization": specialization, "is_available": True})
+        doctor = doctor_directory.snapshot().first_available(specialization)
         doctor_name = doctor["name"] if doctor else "Dr. Auto Assign"
 
         appointment = payload.dict()
@@ -250,15 +298,11 @@ async def book_appointment(payload: AppointmentCreate, current_user: dict = Depe
 
         result = await db.appointments.insert_one(appointment)
         appointment["_id"] = str(result.inserted_id)
+        await bump_version(appointment["user_id"], "appointments")
         appointment["created_at"] = appointment["created_at"].isoformat()  # ✅ Fix datetime serialization
 
-        # Broadcast new appointment (converted to JSON-serializable form)
-        await manager.broadcast({
-            "event": "new_appointment",
-            "data": {
-                **appointment
-            }
-        })
+        # Notify only the booking patient; appointment details are private
+        await manager.send_event("new_appointment", appointment, appointment["user_id"])
 
         return appointment
     except Exception as e:
@@ -268,6 +312,8 @@ async def book_appointment(payload: AppointmentCreate, current_user: dict = Depe
 
 @router.get("/appointments", response_model=List[AppointmentOut])
 async def get_user_appointments(
+    request: Request,
+    response: Response,
     status: Optional[str] = None,
     upcoming: Optional[bool] = None,
     doctor: Optional[str] = None,
@@ -275,6 +321,18 @@ async def get_user_appointments(
 ):
     try:
         filter = {"user_id": str(current_user["_id"])}  # ✅ Ensure it's a string
+
+        # ✅ Conditional GET: answer unchanged polls without querying appointments
+        version = await get_version(filter["user_id"], "appointments")
+        etag = make_etag(
+            filter["user_id"], "appointments", version,
+            {"status": status, "upcoming": upcoming, "doctor": doctor},
+            time_relative=bool(upcoming)
+        )
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=cache_headers(etag))
+        response.headers.update(cache_headers(etag))
+
         if status:
             filter["status"] = status
         if doctor:
@@ -303,6 +361,78 @@ async def get_user_appointments(
         raise HTTPException(status_code=500, detail="Failed to fetch appointments")
 
 
+@router.get("/export/{collection}")
+async def export_history(
+    collection: str,
+    format: str = Query("csv"),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    after: Optional[str] = Query(None),
+    user_id: Optional[List[str]] = Query(None),
+    current_user: dict = Depends(get_current_user)
+):
+    if collection not in EXPORT_COLUMNS:
+        raise HTTPException(status_code=404, detail="Unknown export collection")
+    if format not in ("csv", "parquet"):
+        raise HTTPException(status_code=400, detail="Format must be csv or parquet")
+    if format == "parquet" and pa is None:
+        raise HTTPException(status_code=501, detail="Parquet export is not available")
+    if after:
+        try:
+            parse_resume_token(after)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid resume token")
+
+    # Patients export their own history; cohort exports need a staff role
+    if user_id and current_user.get("role") not in ("admin", "doctor"):
+        raise HTTPException(status_code=403, detail="Not allowed to export other users")
+    user_ids = user_id or [str(current_user["_id"])]
+
+    media_type = "application/vnd.apache.parquet" if format == "parquet" else "text/csv"
+    return StreamingResponse(
+        export_stream(
+            db, collection, format, ExportProgress(after),
+            header=not after, user_ids=user_ids,
+            start=to_naive_utc(start), end=to_naive_utc(end)
+        ),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{collection}.{format}"',
+            # Resume token of a row = these columns joined with "|"; pass the last one as ?after=
+            "X-Resume-Token-Columns": f"user_id,{DATE_FIELDS[collection]},_id",
+        }
+    )
+
+
+# ==== Profiling (admin only, see app/profiling.py) ====
+def require_profile_admin(x_admin_token: Optional[str] = Header(None)):
+    if not profiling.is_admin_token(x_admin_token):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+@router.get("/admin/profiles", dependencies=[Depends(require_profile_admin)])
+async def list_profiles():
+    return profiling.list_profiles()
+
+@router.get("/admin/profiles/{profile_id}", dependencies=[Depends(require_profile_admin)])
+async def download_profile(profile_id: str, format: str = Query("html")):
+    rendered = profiling.render_profile(profile_id, format)
+    if rendered is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    media_types = {"text": "text/plain", "speedscope": "application/json"}
+    extension = {"text": "txt", "speedscope": "speedscope.json"}.get(format, "html")
+    return Response(
+        rendered,
+        media_type=media_types.get(format, "text/html"),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.{extension}"'}
+    )
+
+@router.post("/admin/profiles/arm/{name}", dependencies=[Depends(require_profile_admin)])
+async def arm_profile(name: str):
+    profiling.arm(name)
+    return {"armed": name}
+
+
 from fastapi import WebSocket, WebSocketDisconnect, HTTPException
 
 @router.websocket("/ws/vitals")
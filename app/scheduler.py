@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
 from pytz import timezone
 import random
+from .data_versions import bump_version
 from .database import db
+from .doctor_directory import doctor_directory
 from .specialization_mapping import get_specialist_for_symptom
 
 async def assign_pending_appointments_mongo():
@@ -9,6 +11,8 @@ async def assign_pending_appointments_mongo():
         pending_appointments_cursor = db.appointments.find({"status": "pending"})
         pending_appointments = await pending_appointments_cursor.to_list(length=1000)
 
+        doctors = doctor_directory.snapshot()  # one consistent roster for the whole pass
+
         IST = timezone("Asia/Kolkata")
         now_ist = datetime.now(IST)
 
@@ -16,10 +20,7 @@ async def assign_pending_appointments_mongo():
 
         for appt in pending_appointments:
             specialization = get_specialist_for_symptom(appt.get("reason", ""))
-            doctor = await db.doctors.find_one({
-                "specialization": specialization,
-                "is_available": True
-            })
+            doctor = doctors.first_available(specialization)
 
             doctor_name = doctor["name"] if doctor else "Dr. Auto Assign"
 
@@ -49,6 +50,7 @@ async def assign_pending_appointments_mongo():
                 {"_id": appt["_id"]},
                 {"$set": update_data}
             )
+            await bump_version(str(appt["user_id"]), "appointments")
 
             updated_count += 1
 
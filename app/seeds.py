@@ -1,17 +1,38 @@
+# app/seeds.py
+#
+# Seeds the doctor roster, or generates production-sized synthetic data.
+#
+#   python -m app.seeds                      # the 22 hardcoded doctors
+#   python -m app.seeds generate --users 10000 --vitals-per-user 2000 \
+#       --uri mongodb://localhost:27017 --seed 42
+#
+# Generated data is deterministic for a given --seed and --until (document ids
+# included); only the bcrypt salts differ between runs.
+
+import argparse
 import asyncio
+import calendar
+import math
+import os
+import random
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Tuple
+
+from bson import ObjectId
 from motor.motor_asyncio import AsyncIOMotorClient
 from dotenv import load_dotenv
-import os
+from passlib.context import CryptContext
+from pymongo.errors import BulkWriteError
+
+from app.specialization_mapping import SYMPTOM_TO_SPECIALIZATION
 
 load_dotenv()
 
 MONGO_URI = os.getenv("MONGO_URI")
-
-if not MONGO_URI:
-    raise ValueError("⚠️ MONGO_URI is not set in the .env file!")
-
-client = AsyncIOMotorClient(MONGO_URI)
-db = client["carepulse"]  # Change if you use a different database name
+DB_NAME = "carepulse"  # Change if you use a different database name
 
 doctors = [
     {"name": "Dr. Meera Shah", "specialization": "Dermatologist", "is_available": True},
@@ -46,7 +67,7 @@ doctors = [
     {"name": "Dr. Gayatri Menon", "specialization": "Nephrologist", "is_available": True},
 ]
 
-async def seed_doctors():
+async def seed_doctors(db):
     try:
         existing_count = await db.doctors.count_documents({})
         if existing_count > 0:
@@ -57,8 +78,267 @@ async def seed_doctors():
         print(f"✅ Successfully seeded {len(result.inserted_ids)} doctors.")
     except Exception as e:
         print(f"❌ Error seeding doctors: {str(e)}")
-    finally:
-        client.close()
+
+
+# ==== Synthetic data generator ====
+FIRST_NAMES = [
+    "Aarav", "Vivaan", "Aditya", "Ishaan", "Kabir", "Reyansh", "Arnav", "Dhruv",
+    "Saanvi", "Aanya", "Diya", "Myra", "Kiara", "Anika", "Riya", "Tara",
+]
+LAST_NAMES = [
+    "Sharma", "Verma", "Iyer", "Nair", "Reddy", "Gupta", "Kapoor", "Mehta",
+    "Menon", "Das", "Rao", "Patel", "Joshi", "Khan", "Bose", "Pillai",
+]
+APPOINTMENT_STATUSES = ["pending", "confirmed", "completed", "cancelled"]
+SPECIALIZATIONS = sorted(set(SYMPTOM_TO_SPECIALIZATION.values()) | {"General Physician"})
+SYMPTOMS = list(SYMPTOM_TO_SPECIALIZATION)
+
+
+def _object_id(rng: random.Random, ts: datetime) -> ObjectId:
+    """Deterministic ObjectId whose embedded time matches `ts` (naive UTC, independent of host TZ)."""
+    seconds = calendar.timegm(ts.utctimetuple())
+    return ObjectId(struct.pack(">I", seconds) + rng.getrandbits(64).to_bytes(8, "big"))
+
+
+def _hash_passwords(passwords: List[str], rounds: int) -> List[str]:
+    context = CryptContext(schemes=["bcrypt"], bcrypt__rounds=rounds)
+    return [context.hash(p) for p in passwords]
+
+
+def generate_doctors(seed: int, per_specialization: int, end: datetime) -> List[Dict[str, Any]]:
+    rng = random.Random(f"{seed}:doctors")
+    return [
+        {
+            "_id": _object_id(rng, end),
+            "name": f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i + 1}",
+            "specialization": specialization,
+            "is_available": rng.random() < 0.85,
+        }
+        for specialization in SPECIALIZATIONS
+        for i in range(per_specialization)
+    ]
+
+
+def generate_users(seed: int, count: int, end: datetime) -> List[Dict[str, Any]]:
+    rng = random.Random(f"{seed}:users")
+    start = end - timedelta(days=365)
+    users = []
+    for i in range(count):
+        users.append({
+            "_id": _object_id(rng, start + timedelta(minutes=rng.randint(0, 365 * 24 * 60))),
+            "name": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+            "email": f"user{i}@carepulse.test",
+            "role": "patient",
+        })
+    return users
+
+
+def generate_vitals(seed: int, user_id: str, count: int, interval: timedelta, end: datetime) -> Iterator[Dict[str, Any]]:
+    """Mean-reverting random walk around a per-user baseline, with a daily heart-rate cycle."""
+    rng = random.Random(f"{seed}:vitals:{user_id}")
+    base = {
+        "heart_rate": rng.gauss(74, 8),
+        "bp_systolic": rng.gauss(122, 10),
+        "bp_diastolic": rng.gauss(80, 7),
+        "oxygen": rng.uniform(95, 99.5),
+        "temperature": rng.gauss(36.8, 0.2),
+        "sugar": rng.gauss(105, 15),
+    }
+    noise = {"heart_rate": 3, "bp_systolic": 3, "bp_diastolic": 2, "oxygen": 0.5, "temperature": 0.08, "sugar": 6}
+    current = dict(base)
+    ts = end - interval * count
+
+    for _ in range(count):
+        ts += interval
+        for field, value in current.items():
+            current[field] = value + 0.2 * (base[field] - value) + rng.gauss(0, noise[field])
+        daily = 6 * math.sin((ts.hour + ts.minute / 60 - 10) / 24 * 2 * math.pi)
+        yield {
+            "_id": _object_id(rng, ts),
+            "user_id": user_id,
+            "heart_rate": int(round(current["heart_rate"] + daily)),
+            "bp_systolic": int(round(current["bp_systolic"])),
+            "bp_diastolic": int(round(current["bp_diastolic"])),
+            "oxygen": int(round(min(100, current["oxygen"]))),
+            "temperature": round(current["temperature"], 1),
+            "sugar": int(round(current["sugar"])),
+            "symptoms": rng.choice(SYMPTOMS) if rng.random() < 0.05 else "none",
+            "timestamp": ts,
+        }
+
+
+def generate_appointments(
+    seed: int, user_id: str, count: int, roster: Dict[str, List[str]], end: datetime
+) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(f"{seed}:appointments:{user_id}")
+    for _ in range(count):
+        reason = rng.choice(SYMPTOMS)
+        status = rng.choice(APPOINTMENT_STATUSES)
+        created_at = end - timedelta(minutes=rng.randint(0, 180 * 24 * 60))
+        preferred_date = created_at + timedelta(days=rng.randint(1, 21))
+        doctors_for_reason = roster.get(SYMPTOM_TO_SPECIALIZATION[reason]) or ["Dr. Auto Assign"]
+        yield {
+            "_id": _object_id(rng, created_at),
+            "user_id": user_id,
+            "reason": reason,
+            "notes": None,
+            "doctor_name": "Dr. Auto Assign" if status == "pending" else rng.choice(doctors_for_reason),
+            "status": status,
+            "preferred_date": datetime(preferred_date.year, preferred_date.month, preferred_date.day),
+            "preferred_time": f"{rng.randint(9, 17):02d}:{rng.choice([0, 15, 30, 45]):02d}:00",
+            "created_at": created_at,
+            "updated_at": None if status == "pending" else created_at + timedelta(minutes=rng.randint(1, 120)),
+        }
+
+
+def _batched(docs, size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch = []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _insert_batches(collection, batches, concurrency: int) -> Tuple[int, int]:
+    """
+    Runs unordered insert_many calls with at most `concurrency` in flight.
+    Returns (inserted, skipped); documents already present from an earlier run
+    with the same seed are skipped instead of failing the whole generation.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    inserted = 0
+    skipped = 0
+    pending = set()
+
+    async def insert(batch):
+        nonlocal inserted, skipped
+        try:
+            result = await collection.insert_many(batch, ordered=False)
+            inserted += len(result.inserted_ids)
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != 11000 for error in errors):
+                raise
+            inserted += e.details.get("nInserted", 0)
+            skipped += len(errors)
+        finally:
+            semaphore.release()
+
+    for batch in batches:
+        await semaphore.acquire()
+        task = asyncio.create_task(insert(batch))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+
+    if pending:
+        await asyncio.gather(*pending)
+    return inserted, skipped
+
+
+def _report(name: str, counts: Tuple[int, int], started: float):
+    inserted, skipped = counts
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    print(f"✅ {name}: {inserted} docs in {elapsed:.1f}s ({inserted / elapsed:,.0f} docs/s)")
+    if skipped:
+        print(f"⚠️ {name}: skipped {skipped} docs that already exist (rerun with --drop to regenerate)")
+
+
+async def generate(db, args):
+    if args.drop:
+        for name in ("users", "doctors", "vitals", "appointments"):
+            await db[name].drop()
+
+    # Doctors
+    started = time.perf_counter()
+    roster_docs = generate_doctors(args.seed, args.doctors_per_specialization, args.until)
+    counts = await _insert_batches(db.doctors, _batched(roster_docs, args.batch_size), args.concurrency)
+    _report("doctors", counts, started)
+    roster: Dict[str, List[str]] = {}
+    for doc in roster_docs:
+        if doc["is_available"]:
+            roster.setdefault(doc["specialization"], []).append(doc["name"])
+
+    # Users, with bcrypt spread over worker processes
+    started = time.perf_counter()
+    users = generate_users(args.seed, args.users, args.until)
+    passwords = [args.password] * len(users)
+    chunk = max(1, math.ceil(len(users) / (args.workers * 4)))
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        hashed_chunks = await asyncio.gather(*[
+            loop.run_in_executor(pool, _hash_passwords, passwords[i:i + chunk], args.bcrypt_rounds)
+            for i in range(0, len(passwords), chunk)
+        ])
+    for user, hashed in zip(users, (h for part in hashed_chunks for h in part)):
+        user["password"] = hashed
+    print(f"🔐 Hashed {len(users)} passwords in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    counts = await _insert_batches(db.users, _batched(users, args.batch_size), args.concurrency)
+    _report("users", counts, started)
+
+    user_ids = [str(user["_id"]) for user in users]
+    del users, passwords
+
+    # Vitals and appointments are generated lazily so memory stays at a few batches
+    started = time.perf_counter()
+    interval = timedelta(minutes=args.interval_minutes)
+    vitals = (v for uid in user_ids for v in generate_vitals(args.seed, uid, args.vitals_per_user, interval, args.until))
+    counts = await _insert_batches(db.vitals, _batched(vitals, args.batch_size), args.concurrency)
+    _report("vitals", counts, started)
+
+    started = time.perf_counter()
+    appointments = (
+        a for uid in user_ids
+        for a in generate_appointments(args.seed, uid, args.appointments_per_user, roster, args.until)
+    )
+    counts = await _insert_batches(db.appointments, _batched(appointments, args.batch_size), args.concurrency)
+    _report("appointments", counts, started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed CarePulse data into MongoDB.")
+    parser.add_argument("--uri", default=MONGO_URI, help="MongoDB URI (defaults to MONGO_URI)")
+    parser.add_argument("--db", default=DB_NAME)
+    sub = parser.add_subparsers(dest="command")
+
+    gen = sub.add_parser("generate", help="Generate large deterministic synthetic data")
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument(
+        "--until", type=datetime.fromisoformat,
+        default=datetime.utcnow().replace(minute=0, second=0, microsecond=0),
+        help="End of the generated history (ISO, UTC); pin it for byte-identical reruns"
+    )
+    gen.add_argument("--users", type=int, default=1000)
+    gen.add_argument("--vitals-per-user", type=int, default=500)
+    gen.add_argument("--interval-minutes", type=float, default=60)
+    gen.add_argument("--appointments-per-user", type=int, default=4)
+    gen.add_argument("--doctors-per-specialization", type=int, default=10)
+    gen.add_argument("--password", default="carepulse123", help="Plain password given to every user")
+    gen.add_argument("--bcrypt-rounds", type=int, default=12)
+    gen.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    gen.add_argument("--batch-size", type=int, default=10000)
+    gen.add_argument("--concurrency", type=int, default=8, help="insert_many calls in flight")
+    gen.add_argument("--drop", action="store_true", help="Drop the seeded collections first")
+    args = parser.parse_args()
+
+    if not args.uri:
+        raise ValueError("⚠️ MONGO_URI is not set in the .env file and --uri was not given!")
+
+    async def run():
+        client = AsyncIOMotorClient(args.uri)
+        try:
+            if args.command == "generate":
+                await generate(client[args.db], args)
+            else:
+                await seed_doctors(client[args.db])
+        finally:
+            client.close()
+
+    asyncio.run(run())
+
 
 if __name__ == "__main__":
-    asyncio.run(seed_doctors())
+    main()
@@ -0,0 +1,128 @@
+# app/ws_protocol.py
+#
+# Opt-in compact binary protocol for the real-time vitals WebSocket.
+#
+# Clients negotiate it by offering the "carepulse.msgpack" subprotocol
+# (or, for clients that cannot set subprotocols, ?encoding=msgpack).
+# Everyone else keeps receiving one JSON text frame per event.
+#
+# Binary frame layout: one MessagePack array per tick, each item {"e": event, "d": data}.
+# "new_vitals" data is delta-encoded per connection:
+#   keyframe: {"k": 1, "id": ..., "t": <epoch ms>, "hr": ..., "sys": ..., ...all fields}
+#   delta:    {"id": ..., "t": <ms since previous reading>, ...only changed fields}
+# A client applies each delta on top of the previous reading it holds.
+
+import asyncio
+import os
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; without it every client stays on JSON
+    msgpack = None
+
+MSGPACK_SUBPROTOCOL = "carepulse.msgpack"
+COALESCE_INTERVAL = float(os.getenv("WS_COALESCE_INTERVAL_MS", 50)) / 1000
+
+# Short wire keys for vitals fields
+FIELD_KEYS = {
+    "heart_rate": "hr",
+    "bp_systolic": "sys",
+    "bp_diastolic": "dia",
+    "oxygen": "o2",
+    "temperature": "tmp",
+    "sugar": "sg",
+    "symptoms": "sx",
+}
+
+
+def serialize_default(value: Any):
+    """Fallback serializer shared by the JSON and MessagePack paths."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def negotiate_encoding(websocket) -> Tuple[bool, Optional[str]]:
+    """
+    Returns (use_binary, subprotocol_to_accept) for an incoming WebSocket.
+    The subprotocol is only echoed back when the client actually offered it.
+    """
+    if msgpack is None:
+        return False, None
+
+    offered = websocket.scope.get("subprotocols", [])
+    if MSGPACK_SUBPROTOCOL in offered:
+        return True, MSGPACK_SUBPROTOCOL
+    if websocket.query_params.get("encoding") == "msgpack":
+        return True, None
+    return False, None
+
+
+def _epoch_ms(ts) -> int:
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)  # stored timestamps are naive UTC
+    return int(ts.timestamp() * 1000)
+
+
+class VitalsDeltaEncoder:
+    """Remembers the last reading sent on a connection and emits only what changed."""
+
+    def __init__(self):
+        self._last: Optional[Dict[str, Any]] = None
+        self._last_ts: Optional[int] = None
+
+    def encode(self, reading: Dict[str, Any]) -> Dict[str, Any]:
+        ts = _epoch_ms(reading["timestamp"])
+        current = {key: reading.get(field) for field, key in FIELD_KEYS.items()}
+
+        if self._last is None:
+            out = {"k": 1, "id": str(reading.get("_id")), "t": ts, **current}
+        else:
+            out = {"id": str(reading.get("_id")), "t": ts - self._last_ts}
+            out.update({k: v for k, v in current.items() if self._last.get(k) != v})
+
+        self._last = current
+        self._last_ts = ts
+        return out
+
+
+class BinaryChannel:
+    """
+    Per-connection MessagePack sender. Events queued within one tick are
+    coalesced into a single binary frame.
+    """
+
+    def __init__(self, websocket, on_error: Callable[[], None], interval: float = COALESCE_INTERVAL):
+        self.websocket = websocket
+        self.encoder = VitalsDeltaEncoder()
+        self.interval = interval
+        self._on_error = on_error
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def enqueue(self, event: str, data: Dict[str, Any]):
+        if event == "new_vitals":
+            data = self.encoder.encode(data)
+        self._pending.append({"e": event, "d": data})
+
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        batch, self._pending = self._pending, []
+        self._flush_task = None
+        try:
+            await self.websocket.send_bytes(msgpack.packb(batch, default=serialize_default))
+        except Exception:
+            self._on_error()
+
+    def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        self._pending = []
@@ -0,0 +1,86 @@
+# benchmarks/export.py
+#
+# Measures throughput and peak memory of the export pipeline for vitals.
+#
+# By default rows come from an in-process synthetic source, so only the
+# encoding pipeline is measured. With --mongo the rows are read from the
+# vitals collection at MONGO_URI (seed it with `python -m app.seeds generate`)
+# through the same per-user, date-filtered query the export endpoint runs.
+#
+# Run: python -m benchmarks.export --rows 20000000 --format parquet
+
+import argparse
+import asyncio
+import random
+import resource
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.export import ExportProgress, csv_chunks, parquet_chunks
+
+
+async def synthetic_rows(n: int, users: int = 1000):
+    rng = random.Random(42)
+    ts = datetime(2024, 1, 1)
+    user_ids = [str(ObjectId()) for _ in range(users)]
+    for i in range(n):
+        yield {
+            "_id": str(ObjectId()),
+            "user_id": user_ids[i % users],
+            "timestamp": ts + timedelta(seconds=i),
+            "heart_rate": rng.randint(55, 110),
+            "bp_systolic": rng.randint(100, 150),
+            "bp_diastolic": rng.randint(60, 95),
+            "oxygen": rng.randint(92, 100),
+            "temperature": round(rng.uniform(36.2, 38.0), 1),
+            "sugar": rng.randint(80, 180),
+            "symptoms": "none",
+        }
+
+
+async def run(args):
+    if args.mongo:
+        from app.database import client, db
+        from app.export import iter_rows
+
+        user_ids = args.user or (await db.vitals.distinct("user_id"))[:args.users]
+        start = datetime.utcnow() - timedelta(days=args.days) if args.days else None
+        rows = iter_rows(db, "vitals", user_ids=user_ids, start=start)
+    else:
+        rows = synthetic_rows(args.rows)
+
+    progress = ExportProgress()
+    if args.format == "parquet":
+        chunks = parquet_chunks(rows, "vitals", progress)
+    else:
+        chunks = csv_chunks(rows, "vitals", progress)
+
+    start = time.perf_counter()
+    total_bytes = 0
+    async for chunk in chunks:
+        total_bytes += len(chunk)
+    elapsed = time.perf_counter() - start
+
+    if args.mongo:
+        client.close()
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(
+        f"format={args.format} bytes={total_bytes} "
+        f"elapsed={elapsed:.1f}s peak_rss={peak_mb:.0f} MB last_row={progress.token}"
+    )
+    if not args.mongo:
+        print(f"throughput={args.rows / elapsed:,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--mongo", action="store_true", help="Read from the vitals collection instead")
+    parser.add_argument("--user", action="append", help="With --mongo: export these users (repeatable)")
+    parser.add_argument("--users", type=int, default=100, help="With --mongo and no --user: first N users")
+    parser.add_argument("--days", type=int, default=30, help="With --mongo: only the last N days (0 = all)")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,93 @@
+# benchmarks/ws_protocol.py
+#
+# Compares the JSON text path against the msgpack + delta + coalescing path
+# for real-time vitals: bytes per reading (raw and with permessage-deflate)
+# and CPU time per 10k readings.
+#
+# Run: python -m benchmarks.ws_protocol
+
+import json
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import msgpack
+
+from app.ws_protocol import VitalsDeltaEncoder, serialize_default
+
+READINGS = 10_000
+PER_TICK = 20  # events landing in one coalescing tick on a busy connection
+
+
+def synthetic_readings(n: int):
+    rng = random.Random(42)
+    ts = datetime(2025, 1, 1)
+    hr, sys_, dia, o2, tmp, sugar = 72, 120, 80, 98, 36.8, 100
+    for i in range(n):
+        ts += timedelta(seconds=1)
+        hr = max(40, min(180, hr + rng.choice([-1, 0, 0, 1])))
+        if rng.random() < 0.1:
+            sys_ += rng.choice([-1, 1])
+            dia += rng.choice([-1, 1])
+        if rng.random() < 0.05:
+            o2 = max(88, min(100, o2 + rng.choice([-1, 1])))
+        if rng.random() < 0.02:
+            tmp = round(tmp + rng.choice([-0.1, 0.1]), 1)
+        if rng.random() < 0.01:
+            sugar += rng.choice([-2, 2])
+        yield {
+            "_id": f"{i:024x}",
+            "user_id": "6650f0c2a1b2c3d4e5f60718",
+            "heart_rate": hr,
+            "bp_systolic": sys_,
+            "bp_diastolic": dia,
+            "oxygen": o2,
+            "temperature": tmp,
+            "sugar": sugar,
+            "symptoms": "none",
+            "timestamp": ts,
+        }
+
+
+def deflated_size(frames):
+    # permessage-deflate with context takeover: one compressor for the whole connection
+    comp = zlib.compressobj(wbits=-15)
+    total = 0
+    for frame in frames:
+        total += len(comp.compress(frame)) + len(comp.flush(zlib.Z_SYNC_FLUSH)) - 4
+    return total
+
+
+def bench_json(readings):
+    start = time.process_time()
+    frames = [
+        json.dumps({"event": "new_vitals", "data": r}, default=serialize_default).encode()
+        for r in readings
+    ]
+    return frames, time.process_time() - start
+
+
+def bench_msgpack(readings):
+    start = time.process_time()
+    encoder = VitalsDeltaEncoder()
+    frames = []
+    for i in range(0, len(readings), PER_TICK):
+        batch = [{"e": "new_vitals", "d": encoder.encode(r)} for r in readings[i:i + PER_TICK]]
+        frames.append(msgpack.packb(batch, default=serialize_default))
+    return frames, time.process_time() - start
+
+
+def report(name, frames, cpu, n):
+    raw = sum(len(f) for f in frames)
+    print(
+        f"{name:<16} frames={len(frames):>6}  bytes/reading={raw / n:7.1f}  "
+        f"deflated bytes/reading={deflated_size(frames) / n:7.1f}  "
+        f"cpu per 10k={cpu * 10_000 / n * 1000:7.1f} ms"
+    )
+
+
+if __name__ == "__main__":
+    readings = list(synthetic_readings(READINGS))
+    report("json (current)", *bench_json(readings), READINGS)
+    report("msgpack+delta", *bench_msgpack(readings), READINGS)
@@ -1,8 +1,12 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import router
-from app.database import init_db
+from app.database import db, init_db
+from app.doctor_directory import doctor_directory
+from app.export import ensure_export_indexes
 from app.scheduler import assign_pending_appointments_mongo
+from app.compaction import compact_vitals, ensure_archive_indexes
+from app.profiling import ProfilingMiddleware, profile_block, profiling_enabled
 import asyncio
 import os
 
@@ -16,23 +20,50 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# ✅ Opt-in request profiling; not installed at all unless configured
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
 # ✅ Background coroutine
 async def scheduler_loop():
     while True:
         try:
-            await assign_pending_appointments_mongo()
+            async with profile_block("scheduler"):
+                await assign_pending_appointments_mongo()
         except Exception as e:
             print(f"❌ Error during MongoDB appointment assignment: {e}")
         await asyncio.sleep(60)
 
+# ✅ Background vitals compaction (archives old readings, see app/compaction.py)
+async def compaction_loop():
+    try:
+        await ensure_archive_indexes()
+    except Exception as e:
+        print(f"❌ Error creating vitals archive indexes: {e}")
+    while True:
+        try:
+            await compact_vitals()
+        except Exception as e:
+            print(f"❌ Error during vitals compaction: {e}")
+        await asyncio.sleep(int(os.environ.get("VITALS_COMPACTION_INTERVAL", 3600)))
+
 @app.on_event("startup")
 async def app_startup():
     await init_db()
     print("✅ Beanie initialized with MongoDB")
 
+    await ensure_export_indexes(db)
+
+    await doctor_directory.load()
+    asyncio.create_task(doctor_directory.refresh_loop())
+    print(f"✅ Doctor directory loaded ({len(doctor_directory.snapshot().doctors)} doctors)")
+
     asyncio.create_task(scheduler_loop())
     print("✅ Background MongoDB scheduler started")
 
+    asyncio.create_task(compaction_loop())
+    print("✅ Background vitals compaction started")
+
 # ✅ Include API routes
 app.include_router(router)
 
@@ -40,4 +71,5 @@ app.include_router(router)
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 8000))  # fallback to 8000 if PORT not set
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
+    # permessage-deflate is negotiated per connection; clients that don't offer it get raw frames
+    uvicorn.run("main:app", host="0.0.0.0", port=port, ws="websockets", ws_per_message_deflate=True)